@@ -1,15 +1,22 @@
 # backend/app/api/endpoints/chat.py
-from fastapi import APIRouter, File, UploadFile, HTTPException, Request
+from fastapi import APIRouter, File, Form, UploadFile, HTTPException, Request
 from fastapi.responses import StreamingResponse 
 from ...models.schemas import ChatRequest, PredictResponse # ChatResponse는 안 쓰면 제거 가능
+from ...services.partitions import partition_key
 
 router = APIRouter()
 
+
+def _check_region(region: str | None):
+    # 잘못된 지역 이름이 조용히 전국 공통 가이드로 처리되지 않도록 400으로 거절합니다.
+    if region and not partition_key(region):
+        raise HTTPException(status_code=400, detail=f"지역 이름은 영문/숫자/_/- 만 사용할 수 있습니다: '{region}'")
+
 # -------------------------------------------------------------------
 # 1. 이미지 예측 엔드포인트 (/api/predict)
 # -------------------------------------------------------------------
 @router.post("/predict", response_model=PredictResponse)
-async def predict(request: Request, file: UploadFile = File(...)):
+async def predict(request: Request, file: UploadFile = File(...), region: str | None = Form(None)):
     # 1. 모델 및 서비스 로드 확인
     classifier = request.app.state.classifier
     rag = request.app.state.rag
@@ -22,6 +29,7 @@ async def predict(request: Request, file: UploadFile = File(...)):
     # 2. 파일 타입 검증
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="이미지 파일만 업로드 가능합니다.")
+    _check_region(region)
     
     try:
         # 3. 이미지 읽기 및 예측 실행
@@ -38,9 +46,11 @@ async def predict(request: Request, file: UploadFile = File(...)):
         
         # 5. RAG 서비스 호출 (초기 가이드 멘트 생성)
         # ⭐️ 중요: 정제된 clean_label을 넘겨야 챗봇이 자연스럽게 인식합니다.
+        # ⭐️ region이 있으면 해당 지역(+품목) 가이드에서만 검색합니다.
         rag_info = rag.get_response(
             user_input="", 
-            image_class=clean_label 
+            image_class=clean_label,
+            region=region
         )
         
         # 6. 확률(%) 계산 (선택 사항: 0.0~1.0 사이 값 그대로 보내거나 백분율로 변환)
@@ -69,17 +79,19 @@ async def chat(request: Request, chat_request: ChatRequest):
     rag = request.app.state.rag
     if not rag:
         raise HTTPException(status_code=500, detail="RAG 서비스가 로드되지 않았습니다.")
+    _check_region(chat_request.region)
 
     try:
         # 프론트엔드에서 받은 image_context가 있다면 사용, 없으면 빈 문자열
         context_label = chat_request.image_context if chat_request.image_context else ""
 
         # ⭐️ 로그를 찍어서 현재 어떤 이미지를 기준으로 대화하는지 확인하세요
-        print(f"💬 채팅 요청: '{chat_request.message}' (문맥: {context_label})")
+        print(f"💬 채팅 요청: '{chat_request.message}' (문맥: {context_label}, 지역: {chat_request.region})")
 
         response_generator = rag.stream_response(
             user_input=chat_request.message,
-            image_class=context_label
+            image_class=context_label,
+            region=chat_request.region
         )
         
         return StreamingResponse(response_generator, media_type="text/plain")
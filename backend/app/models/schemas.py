@@ -4,6 +4,7 @@ from pydantic import BaseModel
 class ChatRequest(BaseModel):
     message: str
     image_context: str | None = None
+    region: str | None = None  # 지역 코드 (예: "seoul"). 없으면 전국 공통 가이드를 사용
 
 class ChatResponse(BaseModel):
     response: str
@@ -0,0 +1,32 @@
+# backend/app/services/partitions.py
+import os
+import re
+
+# ---------------------------------------------------------------
+# 지역/품목 파티션 이름 규칙 (indexing.py와 RAGService가 함께 사용)
+# ---------------------------------------------------------------
+# - documents/regions/<지역>/*.md          -> my_faiss_index/regions/<지역>/
+# - documents/regions/<지역>/<품목>/*.md   -> my_faiss_index/regions/<지역>/<품목>/
+REGIONS_DIR = "regions"
+
+# 폴더명으로 쓰이므로 경로 조작을 막기 위해 영문/숫자/_/- 만 허용합니다.
+_NAME_PATTERN = re.compile(r"^[a-z0-9_-]+$")
+
+
+def partition_key(name: str | None) -> str | None:
+    """
+    지역/품목 이름을 폴더명 규칙(소문자 영문/숫자/_/-)으로 정규화합니다.
+    규칙에 맞지 않으면 None을 반환합니다. (예: "ClearPET" -> "clearpet", "../x" -> None)
+    """
+    name = (name or "").strip().lower()
+    return name if _NAME_PATTERN.match(name) else None
+
+
+def item_id(source_path: str) -> str:
+    """
+    문서 파일명으로 품목 ID를 만듭니다. (예: documents/01_clear_pet.md -> "01_clear_pet")
+    지역 문서가 전국 문서와 같은 파일명을 쓰면 그 품목의 전국 가이드를 대체합니다.
+    """
+    # Windows에서 만든 인덱스는 source가 "documents\\01_clear_pet.md" 형태로 저장되어 있습니다.
+    file_name = (source_path or "").replace("\\", "/").rsplit("/", 1)[-1]
+    return os.path.splitext(file_name)[0].lower()
@@ -1,28 +1,58 @@
 # backend/app/services/rag_service.py
 import os
 import asyncio
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from typing import AsyncGenerator
 from dotenv import load_dotenv
 
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 
+from .partitions import REGIONS_DIR, item_id, partition_key
+
 # 클래스 초기화 시 환경 변수 로드
 load_dotenv()
 
+# 동시에 메모리에 올려둘 지역/품목 파티션 수 (전국 공통 인덱스는 항상 유지)
+# 환경 변수 RAG_MAX_LOADED_PARTITIONS로 변경할 수 있습니다.
+DEFAULT_MAX_LOADED_PARTITIONS = 8
+QUERY_EMBEDDING_CACHE_SIZE = 512
+# 색인되지 않은 지역 경고를 기억해 둘 최대 개수
+MAX_WARNED_REGIONS = 1000
+# 답변에 사용할 문서 수
+TOP_K = 3
+
+
+def _max_loaded_partitions_from_env() -> int:
+    value = os.environ.get("RAG_MAX_LOADED_PARTITIONS")
+    if value is None:
+        return DEFAULT_MAX_LOADED_PARTITIONS
+    try:
+        return max(1, int(value))
+    except ValueError:
+        print(f"⚠️ [경고] RAG_MAX_LOADED_PARTITIONS 값이 올바르지 않습니다: '{value}' (기본값 {DEFAULT_MAX_LOADED_PARTITIONS} 사용)")
+        return DEFAULT_MAX_LOADED_PARTITIONS
+
+
 class RAGService:
-    def __init__(self, db_path="my_faiss_index"): 
+    def __init__(self, db_path="my_faiss_index", max_loaded_partitions=None, embeddings=None): 
         if "OPENAI_API_KEY" not in os.environ:
             print("⚠️ [경고] OPENAI_API_KEY가 환경 변수에 없습니다.")
         
         print(f"🚀 RAG Service를 초기화합니다... (DB 경로: {db_path})")
+        self.is_ready = False
         try:
             # 1. 모델 설정 (Fact Check를 위해 temperature=0)
             llm = ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0)
-            embeddings = OpenAIEmbeddings()
+            # 모든 파티션이 하나의 임베딩 객체(클라이언트)를 공유합니다.
+            self.embeddings = embeddings or OpenAIEmbeddings()
+            # 질문 임베딩 캐시: 같은 질문(예: 이미지 감지 직후의 기본 안내)은 API를 다시 호출하지 않습니다.
+            self._embed_query = lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)(self.embeddings.embed_query)
             
             # 2. 벡터 스토어 로드
             if not os.path.exists(db_path):
@@ -33,12 +63,16 @@ class RAGService:
                 else:
                     raise FileNotFoundError(f"벡터 DB 폴더를 찾을 수 없습니다: {db_path}")
 
-            vector_store = FAISS.load_local(
-                folder_path=db_path, 
-                embeddings=embeddings, 
-                allow_dangerous_deserialization=True
-            )
-            retriever = vector_store.as_retriever(search_kwargs={"k": 3})
+            # 전국 공통 인덱스는 시작 시 바로 로드하고, 지역/품목 파티션은 요청이 올 때 로드합니다.
+            self.db_path = db_path
+            if max_loaded_partitions is None:
+                max_loaded_partitions = _max_loaded_partitions_from_env()
+            self.max_loaded_partitions = max(1, max_loaded_partitions)
+            # 파티션 폴더 경로 -> (FAISS, 그 파티션이 대체하는 품목 ID 집합) (LRU 순서)
+            self._partitions = OrderedDict()
+            self._partitions_lock = threading.Lock()
+            self._unknown_regions = set()  # 이미 경고를 남긴 지역 이름
+            self.default_store = self._load_store(db_path)
 
             # 3. ⭐️ 개선된 프롬프트 (가독성 + 팩트체크 강화)
             prompt_template = """
@@ -67,18 +101,122 @@ class RAGService:
                 template=prompt_template, input_variables=["context", "question"]
             )
 
-            # 4. 체인 생성
-            self.chain = (
-                {"context": retriever, "question": RunnablePassthrough()}
-                | PROMPT
-                | llm
-                | StrOutputParser()
-            )
+            # 4. 체인 생성 (질문 -> 답변 부분은 모든 파티션이 공유)
+            self.answer_chain = PROMPT | llm | StrOutputParser()
+            self.is_ready = True
             print("  > ✅ RAG 체인 생성 완료.")
             
         except Exception as e:
             print(f"❌ [치명적 오류] RAG 모델 로드 실패: {e}")
-            self.chain = None
+
+    # ---------------------------------------------------------
+    # 지역/품목 파티션 라우팅
+    # ---------------------------------------------------------
+    def _load_store(self, folder_path: str) -> FAISS:
+        return FAISS.load_local(
+            folder_path=folder_path, 
+            embeddings=self.embeddings, 
+            allow_dangerous_deserialization=True
+        )
+
+    def _region_path(self, region: str | None) -> str | None:
+        """
+        지역 파티션 폴더를 반환합니다. 지역이 없거나, 이름이 규칙에 맞지 않거나, 색인되지 않았으면 None.
+        (설정 오류를 알아챌 수 있도록 알 수 없는 지역은 지역별로 한 번 경고를 남깁니다)
+        """
+        if not region:
+            return None
+
+        region_key = partition_key(region)
+        path = os.path.join(self.db_path, REGIONS_DIR, region_key) if region_key else None
+        if path and os.path.exists(os.path.join(path, "index.faiss")):
+            return path
+
+        with self._partitions_lock:
+            # 임의의 지역 이름으로 집합이 무한히 커지지 않도록 상한을 둡니다.
+            if region in self._unknown_regions or len(self._unknown_regions) >= MAX_WARNED_REGIONS:
+                return None
+            self._unknown_regions.add(region)
+        if region_key:
+            print(f"⚠️ [경고] 색인되지 않은 지역입니다: '{region}' (전국 공통 가이드 사용)")
+        else:
+            print(f"⚠️ [경고] 지역 이름이 규칙(영문/숫자/_/-)에 맞지 않습니다: '{region}' (전국 공통 가이드 사용)")
+        return None
+
+    def _class_path(self, region_path: str, image_class: str) -> str | None:
+        """지역 안의 품목 파티션 폴더를 반환합니다. 없으면 None."""
+        class_key = partition_key(image_class)
+        if not class_key:
+            return None
+        path = os.path.join(region_path, class_key)
+        return path if os.path.exists(os.path.join(path, "index.faiss")) else None
+
+    def _get_partition(self, path: str):
+        """
+        파티션을 (FAISS, 그 파티션이 대체하는 품목 ID 집합)으로 반환합니다.
+        파티션은 처음 요청될 때 로드되고, 최대 개수를 넘으면 가장 오래 안 쓴 것부터 내립니다.
+        """
+        with self._partitions_lock:
+            if path in self._partitions:
+                self._partitions.move_to_end(path)
+                return self._partitions[path]
+
+        store = self._load_store(path)
+        overridden = {
+            item_id(store.docstore.search(doc_id).metadata.get("source", ""))
+            for doc_id in store.index_to_docstore_id.values()
+        }
+        partition = (store, overridden)
+        with self._partitions_lock:
+            self._partitions[path] = partition
+            self._partitions.move_to_end(path)
+            while len(self._partitions) > self.max_loaded_partitions:
+                evicted, _ = self._partitions.popitem(last=False)
+                print(f"  > 🗃️ 파티션 언로드: {evicted}")
+        print(f"  > 🗂️ 파티션 로드: {path}")
+        return partition
+
+    def _retrieve(self, question: str, region: str | None, image_class: str, item_only: bool = False):
+        """
+        전국 공통 가이드에서 검색하고, 지역 파티션이 있으면 그 결과로 덮어씌웁니다.
+        지역 문서와 파일명(품목 ID)이 같은 전국 문서는 제외하고, 남은 문서를 거리순으로 합칩니다.
+        품목 파티션은 사진만 있고 질문이 없을 때(item_only)만 지역 검색 범위를 좁히는 데 사용합니다.
+        (채팅에서는 이전 사진의 품목이 계속 전달되므로, 다른 품목 질문에 지역 규칙이 빠지지 않도록)
+        """
+        vector = self._embed_query(question)
+        region_path = self._region_path(region)
+        if region_path is None:
+            return self.default_store.similarity_search_by_vector(vector, k=TOP_K)
+
+        store, overridden = self._get_partition(region_path)
+        class_path = self._class_path(region_path, image_class) if item_only else None
+        if class_path:
+            store, _ = self._get_partition(class_path)
+
+        # 대체된 품목이 걸러져도 TOP_K개가 남도록 넉넉히 가져옵니다.
+        national = [
+            (doc, score)
+            for doc, score in self.default_store.similarity_search_with_score_by_vector(
+                vector, k=TOP_K + len(overridden)
+            )
+            if item_id(doc.metadata.get("source", "")) not in overridden
+        ]
+        regional = store.similarity_search_with_score_by_vector(vector, k=TOP_K)
+        merged = sorted(regional + national, key=lambda pair: pair[1])
+        return [doc for doc, _ in merged[:TOP_K]]
+
+    def _build_chain(self, region: str | None, image_class: str, item_only: bool):
+        # 파티션 로드(디스크 I/O)가 검색 단계에서 일어나도록 RunnableLambda로 감쌉니다.
+        # (스트리밍 시 LangChain이 동기 함수를 별도 스레드에서 실행하므로 이벤트 루프를 막지 않음)
+        return (
+            {
+                "context": RunnableLambda(
+                    lambda question: self._retrieve(question, region, image_class, item_only)
+                ),
+                "question": RunnablePassthrough(),
+            }
+            | self.answer_chain
+        )
 
     # ---------------------------------------------------------
     # 공통 질문 생성 로직 (중복 제거를 위해 분리)
@@ -95,8 +233,8 @@ class RAGService:
     # ---------------------------------------------------------
     # 1. 일반 응답 (동기 방식 - YOLO API 등에서 사용)
     # ---------------------------------------------------------
-    def get_response(self, user_input: str, image_class: str) -> str:
-        if not self.chain:
+    def get_response(self, user_input: str, image_class: str, region: str | None = None) -> str:
+        if not self.is_ready:
             return "죄송합니다. RAG 서버가 초기화되지 않았습니다."
         
         final_question = self._create_final_question(user_input, image_class)
@@ -104,7 +242,7 @@ class RAGService:
             return "질문할 내용이 없습니다."
 
         try:
-            return self.chain.invoke(final_question)
+            return self._build_chain(region, image_class, item_only=not user_input).invoke(final_question)
         except Exception as e:
             print(f"RAG 처리 중 오류: {e}")
             return "답변 생성 중 오류가 발생했습니다."
@@ -112,8 +250,8 @@ class RAGService:
     # ---------------------------------------------------------
     # 2. 스트리밍 응답 (비동기 방식 - 채팅 API에서 사용)
     # ---------------------------------------------------------
-    async def stream_response(self, user_input: str, image_class: str) -> AsyncGenerator[str, None]:
-        if not self.chain:
+    async def stream_response(self, user_input: str, image_class: str, region: str | None = None) -> AsyncGenerator[str, None]:
+        if not self.is_ready:
             yield "죄송합니다. RAG 서버가 초기화되지 않았습니다."
             return
 
@@ -124,7 +262,7 @@ class RAGService:
 
         try:
             # LangChain의 astream을 사용하여 토큰 단위로 스트리밍
-            async for chunk in self.chain.astream(final_question):
+            async for chunk in self._build_chain(region, image_class, item_only=not user_input).astream(final_question):
                 yield chunk 
                 await asyncio.sleep(0.01) # 너무 빠른 전송 방지
         except Exception as e:
@@ -1,5 +1,7 @@
 # backend/indexing.py
 import os
+import shutil
+import sys
 import time
 # ⭐️ .env 파일을 읽기 위한 라이브러리 추가
 from dotenv import load_dotenv 
@@ -7,6 +9,10 @@ from dotenv import load_dotenv
 from langchain_community.document_loaders import DirectoryLoader, UnstructuredMarkdownLoader
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
+from langchain_classic.embeddings import CacheBackedEmbeddings
+from langchain_classic.storage import LocalFileStore
+
+from app.services.partitions import REGIONS_DIR, partition_key
 
 # ---------------------------------------------------------------
 # 0. 환경 변수 로드 (.env 파일 읽기)
@@ -19,53 +25,144 @@ load_dotenv()
 # ---------------------------------------------------------------
 DATA_SOURCE_PATH = "documents" 
 VECTOR_DB_PATH = "my_faiss_index"
+# 지역별 문서/인덱스 폴더 규칙은 app/services/partitions.py 참고
+# documents/ 바로 아래의 .md 파일은 기존처럼 전국 공통 가이드(my_faiss_index/)로 저장됩니다.
+# 문서 임베딩 캐시 (내용이 같은 문서는 재색인 시 API를 다시 호출하지 않음)
+EMBEDDING_CACHE_PATH = "embedding_cache"
 # ---------------------------------------------------------------
 
-def main():
-    print(f"1. '{DATA_SOURCE_PATH}' 폴더에서 .md 파일 로드를 시작합니다...")
+def collect_region_partitions(regions_db: str):
+    """
+    색인할 지역/품목 파티션 목록을 (이름, 문서 폴더, 저장 폴더, 하위 폴더 포함 여부)로 반환합니다.
+    저장 폴더는 regions_db 아래에 만들어집니다.
+    """
+    partitions = []
+
+    regions_root = os.path.join(DATA_SOURCE_PATH, REGIONS_DIR)
+    if not os.path.isdir(regions_root):
+        return partitions
+
+    for region_dir in sorted(os.listdir(regions_root)):
+        region_path = os.path.join(regions_root, region_dir)
+        region = partition_key(region_dir)
+        if not os.path.isdir(region_path):
+            continue
+        if not region:
+            print(f"  > [건너뜀] 지역 폴더명 '{region_dir}'은(는) 영문/숫자/_/- 만 사용할 수 있습니다.")
+            continue
+
+        region_db = os.path.join(regions_db, region)
+        # 지역 전체 파티션: 품목 폴더까지 모두 포함 (전국 가이드를 덮어쓰는 기준)
+        partitions.append((region, region_path, region_db, True))
+
+        for class_dir in sorted(os.listdir(region_path)):
+            class_path = os.path.join(region_path, class_dir)
+            item_class = partition_key(class_dir)
+            if not os.path.isdir(class_path):
+                continue
+            if not item_class:
+                print(f"  > [건너뜀] 품목 폴더명 '{class_dir}'은(는) 영문/숫자/_/- 만 사용할 수 있습니다.")
+                continue
+            partitions.append(
+                (f"{region}/{item_class}", class_path, os.path.join(region_db, item_class), True)
+            )
+
+    return partitions
+
+
+def load_documents(source_path: str, recursive: bool):
     loader = DirectoryLoader(
-        DATA_SOURCE_PATH,  
-        glob="**/*.md",
+        source_path,  
+        # 전국 공통 가이드는 documents/ 바로 아래 파일만 사용 (지역 문서가 섞이지 않도록)
+        glob="**/*.md" if recursive else "*.md",
         loader_cls=UnstructuredMarkdownLoader,
         show_progress=True,
         use_multithreading=True
     )
+    return loader.load()
 
+
+def build_partition(name, source_path, db_path, recursive, embeddings) -> bool:
+    print(f"\n[{name}] '{source_path}' 폴더에서 .md 파일 로드를 시작합니다...")
     try:
-        docs = loader.load()
+        docs = load_documents(source_path, recursive)
         if not docs:
-            print(f"[오류] '{DATA_SOURCE_PATH}' 폴더에 파일이 없거나 .md 파일을 읽을 수 없습니다.")
-            print("backend/documents 폴더에 .md 파일이 있는지 확인하세요.")
-            return
+            print(f"[오류] '{source_path}' 폴더에 파일이 없거나 .md 파일을 읽을 수 없습니다.")
+            return False
         print(f"  > 총 {len(docs)}개의 문서를 성공적으로 로드했습니다.")
 
     except Exception as e:
         print(f"[오류] 문서 로드 중 예외가 발생했습니다: {e}")
         print("unstructured, unstructured-markdown 라이브러리가 올바르게 설치되었는지 확인하세요.")
-        return
-
-    print("2. 문서 크기 분석 결과, 청킹(분할)을 생략합니다. (문서 1개 = 1 청크)")
-    split_docs = docs
+        return False
 
-    print("3. OpenAI 임베딩 모델로 문서를 벡터화합니다. (API 호출 발생)")
+    # 문서 크기 분석 결과, 청킹(분할)을 생략합니다. (문서 1개 = 1 청크)
     start_time = time.time()
     try:
-        # .env에서 로드된 API 키가 자동으로 사용됩니다.
-        embeddings = OpenAIEmbeddings()
-        vector_store = FAISS.from_documents(split_docs, embeddings)
-
+        vector_store = FAISS.from_documents(docs, embeddings)
     except Exception as e:
         print(f"[오류] 임베딩 또는 FAISS 생성 중 오류가 발생했습니다: {e}")
         print("API 키가 올바른지, OpenAI 사용량 한도가 남았는지 확인하세요.")
-        return
+        return False
 
     end_time = time.time()
     print(f"  > 벡터화 완료. (소요 시간: {end_time - start_time:.2f}초)")
 
-    print(f"4. 벡터 스토어를 '{VECTOR_DB_PATH}' 폴더에 저장합니다.")
-    vector_store.save_local(VECTOR_DB_PATH)
+    vector_store.save_local(db_path)
+    print(f"  > '{db_path}' 폴더에 저장했습니다.")
+    return True
+
+
+def main() -> bool:
+    # 지역 인덱스는 임시 폴더에 모두 만든 뒤 한 번에 교체합니다.
+    # (삭제/이름 변경된 지역 폴더의 인덱스는 남지 않고, 중간에 실패하면 기존 인덱스가 그대로 유지됨)
+    regions_db = os.path.join(VECTOR_DB_PATH, REGIONS_DIR)
+    regions_tmp = regions_db + ".tmp"
+    if os.path.isdir(regions_tmp):
+        shutil.rmtree(regions_tmp)
+
+    print("1. 색인할 파티션(전국 공통 / 지역 / 지역+품목)을 찾습니다...")
+    region_partitions = collect_region_partitions(regions_tmp)
+    names = ["national"] + [p[0] for p in region_partitions]
+    print(f"  > 총 {len(names)}개의 파티션: {', '.join(names)}")
+
+    print("2. OpenAI 임베딩 모델을 준비합니다. (캐시된 문서는 API를 다시 호출하지 않습니다)")
+    # .env에서 로드된 API 키가 자동으로 사용됩니다.
+    # 모든 파티션이 하나의 임베딩 캐시를 공유하므로, 지역 간 중복 문서는 한 번만 임베딩됩니다.
+    underlying = OpenAIEmbeddings()
+    embeddings = CacheBackedEmbeddings.from_bytes_store(
+        underlying,
+        LocalFileStore(EMBEDDING_CACHE_PATH),
+        namespace=underlying.model,
+    )
+
+    print("3. 파티션별로 문서를 벡터화하고 저장합니다.")
+    national_ok = build_partition("national", DATA_SOURCE_PATH, VECTOR_DB_PATH, False, embeddings)
+    failed_regions = [
+        name for name, source_path, db_path, recursive in region_partitions
+        if not build_partition(name, source_path, db_path, recursive, embeddings)
+    ]
 
-    print(f"\n[성공] '{VECTOR_DB_PATH}' 생성이 완료되었습니다.")
+    print("\n4. 지역 인덱스를 교체합니다.")
+    if failed_regions:
+        shutil.rmtree(regions_tmp, ignore_errors=True)
+        print(f"[오류] 지역 파티션 생성에 실패하여 기존 지역 인덱스를 그대로 유지합니다: {', '.join(failed_regions)}")
+    else:
+        regions_old = regions_db + ".old"
+        if os.path.isdir(regions_old):
+            shutil.rmtree(regions_old)
+        if os.path.isdir(regions_db):
+            os.rename(regions_db, regions_old)
+        if os.path.isdir(regions_tmp):
+            os.rename(regions_tmp, regions_db)
+        shutil.rmtree(regions_old, ignore_errors=True)
+        print(f"  > '{regions_db}' 교체 완료. ({len(region_partitions)}개 파티션)")
+
+    if not national_ok:
+        print(f"\n[오류] 전국 공통 인덱스 생성에 실패했습니다. 기존 '{VECTOR_DB_PATH}'를 그대로 사용합니다.")
+    elif not failed_regions:
+        print(f"\n[성공] '{VECTOR_DB_PATH}' 생성이 완료되었습니다.")
+    return national_ok and not failed_regions
 
 if __name__ == "__main__":
     # load_dotenv()가 위에서 실행되었으므로 os.environ에서 키 확인 가능
@@ -73,5 +170,6 @@ if __name__ == "__main__":
         print("[오류] OPENAI_API_KEY를 찾을 수 없습니다.")
         print("1. .env 파일이 존재하는지 확인하세요.")
         print("2. .env 파일 안에 'OPENAI_API_KEY=sk-...' 형식이 맞는지 확인하세요.")
-    else:
-        main()
\ No newline at end of file
+    elif not main():
+        # 스케줄러 등에서 실패를 알 수 있도록 종료 코드를 남깁니다.
+        sys.exit(1)
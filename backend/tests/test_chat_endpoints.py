@@ -0,0 +1,76 @@
+# backend/tests/test_chat_endpoints.py
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import chat
+
+
+class StubClassifier:
+    def predict_image_bytes(self, image_bytes):
+        return "01_ClearPET", 0.9
+
+
+class StubRAG:
+    """RAGService 대신 호출 인자를 기록하는 테스트용 서비스"""
+
+    def __init__(self):
+        self.calls = []
+
+    def get_response(self, user_input, image_class, region=None):
+        self.calls.append(("get_response", user_input, image_class, region))
+        return "안내"
+
+    async def stream_response(self, user_input, image_class, region=None):
+        self.calls.append(("stream_response", user_input, image_class, region))
+        yield "답변"
+
+
+@pytest.fixture
+def rag():
+    return StubRAG()
+
+
+@pytest.fixture
+def client(rag):
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/api")
+    app.state.classifier = StubClassifier()
+    app.state.rag = rag
+    return TestClient(app)
+
+
+def _predict(client, **data):
+    files = {"file": ("pet.jpg", b"fake-image", "image/jpeg")}
+    return client.post("/api/predict", files=files, data=data)
+
+
+def test_predict_passes_region_to_rag(client, rag):
+    response = _predict(client, region="seoul")
+
+    assert response.status_code == 200
+    assert response.json()["rag_info"] == "안내"
+    assert rag.calls == [("get_response", "", "ClearPET", "seoul")]
+
+
+def test_predict_without_region(client, rag):
+    assert _predict(client).status_code == 200
+    assert rag.calls == [("get_response", "", "ClearPET", None)]
+
+
+def test_chat_passes_region_to_rag(client, rag):
+    response = client.post(
+        "/api/chat",
+        json={"message": "뚜껑은요?", "image_context": "ClearPET", "region": "seoul"},
+    )
+
+    assert response.status_code == 200
+    assert response.text == "답변"
+    assert rag.calls == [("stream_response", "뚜껑은요?", "ClearPET", "seoul")]
+
+
+@pytest.mark.parametrize("region", ["../x", "서울"])
+def test_rejects_invalid_region(client, rag, region):
+    assert _predict(client, region=region).status_code == 400
+    assert client.post("/api/chat", json={"message": "hi", "region": region}).status_code == 400
+    assert rag.calls == []
@@ -0,0 +1,173 @@
+# backend/tests/test_rag_partitions.py
+import os
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import RunnableLambda
+from langchain_community.vectorstores import FAISS
+
+from app.services import rag_service
+from app.services.rag_service import RAGService
+
+KEYWORDS = ["pet", "battery", "paper", "seoul", "busan"]
+
+
+class KeywordEmbeddings(Embeddings):
+    """키워드 등장 횟수로 벡터를 만드는 테스트용 임베딩 (API 호출 없음)"""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [float(text.count(word)) for word in KEYWORDS] + [0.1]
+
+
+def _doc(text, source):
+    return Document(page_content=text, metadata={"source": source})
+
+
+def _save(path, docs):
+    FAISS.from_documents(docs, KeywordEmbeddings()).save_local(str(path))
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """
+    my_faiss_index/                        전국: PET, 배터리, 종이
+    my_faiss_index/regions/seoul/          서울: 배터리, PET 대체 (품목 폴더 포함)
+    my_faiss_index/regions/seoul/clearpet/ 서울 PET 품목 파티션
+    my_faiss_index/regions/busan/          부산: 종이만 대체
+    """
+    _save(tmp_path, [
+        _doc("pet", "documents\\01_clear_pet.md"),
+        _doc("battery", "documents\\23_battery.md"),
+        _doc("paper", "documents\\05_paper.md"),
+    ])
+    seoul_pet = _doc("pet seoul", "documents/regions/seoul/clearpet/01_clear_pet.md")
+    _save(tmp_path / "regions" / "seoul", [
+        _doc("battery seoul", "documents/regions/seoul/23_battery.md"),
+        seoul_pet,
+    ])
+    _save(tmp_path / "regions" / "seoul" / "clearpet", [seoul_pet])
+    _save(tmp_path / "regions" / "busan", [_doc("paper busan", "documents/regions/busan/05_paper.md")])
+    return tmp_path
+
+
+@pytest.fixture
+def make_service(db_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+    def make(**kwargs):
+        service = RAGService(db_path=str(db_path), embeddings=KeywordEmbeddings(), **kwargs)
+        assert service.is_ready
+        return service
+
+    return make
+
+
+def _loaded(service):
+    return [os.path.relpath(path, service.db_path) for path in service._partitions]
+
+
+def _contents(docs):
+    return [doc.page_content for doc in docs]
+
+
+def test_resolves_region_and_class_paths(make_service):
+    service = make_service()
+    seoul = os.path.join(service.db_path, "regions", "seoul")
+
+    assert service._region_path("Seoul") == seoul
+    assert service._class_path(seoul, "ClearPET") == os.path.join(seoul, "clearpet")
+    assert service._class_path(seoul, "Battery") is None
+    assert service._region_path("daegu") is None
+    assert service._region_path(None) is None
+
+
+def test_region_overrides_only_its_own_items(make_service):
+    service = make_service()
+
+    battery = _contents(service._retrieve("battery", "seoul", ""))
+    assert battery[0] == "battery seoul"
+    assert "battery" not in battery
+
+    # 부산에 PET 문서가 없어도 전국 PET 가이드가 검색되어야 합니다.
+    assert _contents(service._retrieve("pet", "busan", ""))[0] == "pet"
+
+
+def test_region_overrides_apply_with_other_image_context(make_service):
+    # 채팅에서는 이전 사진의 품목(ClearPET)이 계속 전달되므로, 배터리 질문에도 서울 규칙이 적용되어야 합니다.
+    service = make_service()
+    contexts = []
+    service.answer_chain = RunnableLambda(lambda inputs: contexts.append(inputs["context"]) or "답변")
+
+    service.get_response(user_input="battery", image_class="ClearPET", region="seoul")
+
+    assert _contents(contexts[0])[0] == "battery seoul"
+    assert "battery" not in _contents(contexts[0])
+    assert _loaded(service) == [os.path.join("regions", "seoul")]
+
+
+def test_class_partition_narrows_item_only_questions(make_service):
+    service = make_service()
+
+    docs = _contents(service._retrieve("pet battery", "seoul", "ClearPET", item_only=True))
+
+    assert docs[0] == "pet seoul"
+    # 지역 결과는 품목 파티션에서만, 대체된 전국 문서는 계속 제외
+    assert not {"battery seoul", "battery", "pet"} & set(docs)
+    assert _loaded(service) == [os.path.join("regions", "seoul"), os.path.join("regions", "seoul", "clearpet")]
+
+
+@pytest.mark.parametrize("region", ["../x", "..", "seoul/../busan", "서울"])
+def test_invalid_region_falls_back_to_national(make_service, region):
+    service = make_service()
+
+    assert service._region_path(region) is None
+    assert _contents(service._retrieve("paper", region, ""))[0] == "paper"
+    assert _loaded(service) == []
+
+
+def test_warns_once_per_unknown_region(make_service, capsys):
+    service = make_service()
+    capsys.readouterr()
+
+    for _ in range(3):
+        service._retrieve("paper", "daegu", "")
+        service._retrieve("paper", "../x", "")
+
+    out = capsys.readouterr().out
+    assert out.count("'daegu'") == 1
+    assert out.count("'../x'") == 1
+
+
+def test_evicts_least_recently_used_partition(make_service):
+    service = make_service(max_loaded_partitions=2)
+    regions = os.path.join(service.db_path, "regions")
+
+    service._get_partition(os.path.join(regions, "seoul"))
+    service._get_partition(os.path.join(regions, "busan"))
+    service._get_partition(os.path.join(regions, "seoul"))  # seoul을 최근 사용으로 갱신
+    service._get_partition(os.path.join(regions, "seoul", "clearpet"))
+
+    assert _loaded(service) == [
+        os.path.join("regions", "seoul"),
+        os.path.join("regions", "seoul", "clearpet"),
+    ]
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, rag_service.DEFAULT_MAX_LOADED_PARTITIONS),
+    ("3", 3),
+    ("0", 1),
+    ("-5", 1),
+    ("many", rag_service.DEFAULT_MAX_LOADED_PARTITIONS),
+])
+def test_max_loaded_partitions_from_env(make_service, monkeypatch, value, expected):
+    if value is None:
+        monkeypatch.delenv("RAG_MAX_LOADED_PARTITIONS", raising=False)
+    else:
+        monkeypatch.setenv("RAG_MAX_LOADED_PARTITIONS", value)
+
+    assert make_service().max_loaded_partitions == expected